@@ -1,143 +1,532 @@
+import asyncio
+import json
+import os
+import random
+import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from fastapi import FastAPI, HTTPException
 import uvicorn
 import akshare as ak
+import numpy as np
 import pandas as pd
+import requests
+from cachetools import TTLCache
+from pydantic import BaseModel, ConfigDict
+from requests.adapters import HTTPAdapter
 
-app = FastAPI(title="Stock Data Fetcher API", description="纯净股票数据搬运工")
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis 为可选依赖，未安装时只使用进程内缓存
+    aioredis = None
 
-def fetch_data_with_retry(fetch_func, *args, **kwargs):
+def build_shared_session() -> requests.Session:
     """
-    通用容错处理：遇到接口报错或超时，自动执行 3 次重试，每次间隔 10 秒。
-    防范服务器休眠或网络波动导致的采集失败。
+    构建全局共享的 HTTP 会话：连接池复用 TCP/TLS 连接，避免每次请求东方财富都重新握手。
+    """
+    session = requests.Session()
+    # 连接池层不做重试：重试统一由 fetch_data_with_retry 负责，避免两层重试叠加放大对上游的请求次数
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=0,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+HTTP_SESSION = build_shared_session()
+# akshare 内部直接调用 requests.get / requests.post，它们最终都会走到 requests.api.request；
+# 将其替换为共享会话的 request，无需改动 akshare 即可复用连接池
+requests.api.request = HTTP_SESSION.request
+requests.request = HTTP_SESSION.request
+
+# 日线接口所在域名；全市场行情域名由后台刷新任务在启动时即会访问，无需单独预热
+WARMUP_URLS = ["https://push2his.eastmoney.com"]
+
+def warm_up():
+    """
+    启动预热：提前建立到东方财富的 TLS 连接、加载 parquet 读写模块，避免首个用户请求承担这些一次性开销。
+    """
+    import pyarrow.parquet  # noqa: F401
+    for url in WARMUP_URLS:
+        try:
+            HTTP_SESSION.head(url, timeout=2)
+        except requests.RequestException as e:
+            print(f"预热连接失败，不影响正常服务 (错误信息: {e})")
+
+# akshare 的接口全部是同步阻塞调用，统一放进有界线程池执行，防止并发突增时线程被耗尽
+AKSHARE_MAX_WORKERS = 16
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    executor = ThreadPoolExecutor(max_workers=AKSHARE_MAX_WORKERS, thread_name_prefix="akshare")
+    asyncio.get_running_loop().set_default_executor(executor)
+    refresher = asyncio.create_task(market_data_refresher())
+    # 预热放到后台执行，不阻塞服务启动
+    warmup = asyncio.create_task(asyncio.to_thread(warm_up))
+    yield
+    warmup.cancel()
+    refresher.cancel()
+    executor.shutdown(wait=False)
+
+app = FastAPI(
+    title="Stock Data Fetcher API",
+    description="纯净股票数据搬运工",
+    lifespan=lifespan,
+)
+
+# ---------------------------------------------------------
+# 响应模型：声明固定的字段与类型，FastAPI 由 pydantic-core 校验后直接序列化为 JSON bytes（不经中间 dict）；
+# 该快速路径要求不设置自定义 response_class。
+# 行情源可能给出 NaN（如亏损股的动态市盈率），相应字段允许为空，序列化时 NaN 输出为 null
+# ---------------------------------------------------------
+class StockInfo(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    code: str
+    name: str
+    industry: str
+    total_mv: float | None
+    pe_ttm: float | None
+    roe: float
+    roe_source: str
+
+class HistoryBar(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    date: str
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int
+    turnover: float
+
+class RealtimeQuote(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    current_price: float | None
+    volume_ratio: float | None
+    turnover_rate: float | None
+    pct_change: float | None
+
+class StockDataResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    info: StockInfo
+    history: list[HistoryBar]
+    realtime: RealtimeQuote
+
+def _is_client_error(e: Exception) -> bool:
+    response = getattr(e, "response", None)
+    return isinstance(e, requests.HTTPError) and response is not None and 400 <= response.status_code < 500
+
+async def fetch_data_with_retry(fetch_func, *args, **kwargs):
+    """
+    通用容错处理：在线程池中执行阻塞的 fetch_func，遇到接口报错或超时自动重试，最多拉取 3 次。
+    重试间隔为带随机抖动的指数退避（约 1 秒、2 秒），等待期间既不占用线程也不阻塞事件循环；
+    抖动可避免上游恢复瞬间所有请求同时重试。上游返回 4xx 说明请求本身有误，直接失败不再重试。
     """
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            return fetch_func(*args, **kwargs)
+            return await asyncio.to_thread(fetch_func, *args, **kwargs)
         except Exception as e:
+            if _is_client_error(e):
+                raise
             if attempt < max_retries - 1:
-                print(f"抓取异常，10秒后进行第 {attempt + 2} 次重试 (错误信息: {e})")
-                time.sleep(10)
+                delay = min(2 ** attempt, 8) + random.random()
+                print(f"抓取异常，{delay:.1f}秒后进行第 {attempt + 2} 次重试 (错误信息: {e})")
+                await asyncio.sleep(delay)
             else:
                 raise Exception(f"连续 {max_retries} 次拉取失败，请检查网络或目标接口。详细错误: {e}")
 
-@app.get("/api/stock/{stock_code}")
-def get_stock_data(stock_code: str):
+# ---------------------------------------------------------
+# 缓存：进程内 TTL 缓存为第一层，配置 REDIS_URL 时以 Redis 作为第二层共享缓存
+# ---------------------------------------------------------
+RESPONSE_TTL = 120          # 整体响应（含实时盘口）缓存 2 分钟
+REDIS_RESPONSE_TTL = 300
+INDICATOR_TTL = 6 * 3600    # 财务指标按季度更新，缓存 6 小时
+# 日线不设进程内缓存：磁盘缓存按收盘时刻失效，再叠加固定 TTL 的内存层会把收盘后的刷新挡住
+
+RESPONSE_CACHE: TTLCache = TTLCache(maxsize=2048, ttl=RESPONSE_TTL)
+INDICATOR_CACHE: TTLCache = TTLCache(maxsize=2048, ttl=INDICATOR_TTL)
+
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL and aioredis is None:
+    print("已配置 REDIS_URL 但未安装 redis 包，退回仅使用进程内缓存")
+redis_client = aioredis.from_url(REDIS_URL) if REDIS_URL and aioredis is not None else None
+
+# 单飞（single-flight）：同一个 key 同时只有一个上游请求在途，后到的请求直接等待同一个结果
+_inflight: dict[str, asyncio.Task] = {}
+_MISSING = object()
+
+async def single_flight(key: str, coro_factory):
+    """
+    合并同一 key 的并发请求：首个调用者以独立任务执行 coro_factory()，其余调用者等待同一个任务。
+    任务独立于调用者运行，首个客户端断开连接也不会连带取消其他等待者。
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(coro_factory())
+        _inflight[key] = task
+
+        def _done(t: asyncio.Task):
+            if _inflight.get(key) is t:
+                del _inflight[key]
+
+        task.add_done_callback(_done)
+    return await asyncio.shield(task)
+
+async def cached_fetch(cache: TTLCache, key: str, fetch):
+    """
+    进程内缓存读取：命中时不经过任何锁；未命中时经单飞 await fetch() 并写回缓存（None 结果不缓存）。
+    """
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    async def fetch_and_store():
+        value = await fetch()
+        if value is not None:
+            cache[key] = value
+        return value
+
+    return await single_flight(key, fetch_and_store)
+
+async def get_cached_response(key: str):
+    value = RESPONSE_CACHE.get(key)
+    if value is not None or redis_client is None:
+        return value
+    try:
+        raw = await redis_client.get(key)
+    except Exception as e:
+        # Redis 不可用时优雅降级为进程内缓存，不影响正常请求
+        print(f"Redis 读取失败，降级为进程内缓存 (错误信息: {e})")
+        return None
+    if raw is None:
+        return None
+    value = json.loads(raw)
+    RESPONSE_CACHE[key] = value
+    return value
+
+async def set_cached_response(key: str, value: dict):
+    RESPONSE_CACHE[key] = value
+    if redis_client is None:
+        return
+    try:
+        await redis_client.set(key, json.dumps(value, ensure_ascii=False), ex=REDIS_RESPONSE_TTL)
+    except Exception as e:
+        print(f"Redis 写入失败，仅保留进程内缓存 (错误信息: {e})")
+
+# ---------------------------------------------------------
+# 全市场实时行情缓存：后台任务每 550 秒刷新一次（短于 600 秒有效期），用户请求基本不会遇到冷缓存
+# ---------------------------------------------------------
+MARKET_CACHE_TTL = 600
+MARKET_REFRESH_INTERVAL = 550
+
+CACHE = {"market_data": None, "last_update": 0.0}
+
+# stock_zh_a_spot_em 返回 20 多列，下游只用到以下字段；写入缓存前裁剪，降低常驻内存（Render 免费实例仅 512MB）
+MARKET_COLUMNS = [
+    "代码", "名称", "最新价", "涨跌幅", "换手率", "量比", "总市值", "市盈率-动态",
+    "净资产收益率", "板块名称", "行业", "所属行业",
+]
+
+def _market_data_fresh() -> bool:
+    return CACHE["market_data"] is not None and time.time() - CACHE["last_update"] < MARKET_CACHE_TTL
+
+async def refresh_market_data() -> pd.DataFrame:
+    """
+    拉取全市场实时行情并写入 CACHE；后台任务与缓存过期时的请求共用同一次在途拉取。
+    """
+    async def fetch_and_store():
+        df = await fetch_data_with_retry(ak.stock_zh_a_spot_em)
+        df = df[[col for col in MARKET_COLUMNS if col in df.columns]]
+        # 以股票代码建立索引，单只股票查询走哈希查找，而不是每次对 5000 行做布尔过滤
+        df = df.set_index("代码", drop=False)
+        df = df[~df.index.duplicated()]
+        CACHE["market_data"] = df
+        CACHE["last_update"] = time.time()
+        return df
+
+    return await single_flight("market_data", fetch_and_store)
+
+async def get_cached_market_data() -> pd.DataFrame:
+    if _market_data_fresh():
+        return CACHE["market_data"]
+    return await refresh_market_data()
+
+async def market_data_refresher():
+    while True:
+        try:
+            await refresh_market_data()
+        except Exception as e:
+            print(f"后台刷新全市场行情失败，将在下个周期重试 (错误信息: {e})")
+        await asyncio.sleep(MARKET_REFRESH_INTERVAL)
+
+@app.get("/api/stock/{stock_code}", response_model=StockDataResponse)
+async def get_stock_data(stock_code: str):
     """
     API 接口：传入股票代码（如 600000 或 000001），返回结构化 JSON
     """
     try:
-        # ---------------------------------------------------------
-        # Step 1 & 3: 定位与捕获 (静态基础信息 + 当日实时盘口)
-        # ---------------------------------------------------------
-        def get_realtime_and_info():
-            # 获取 A 股实时行情数据（包含基础信息）
-            df = ak.stock_zh_a_spot_em() 
-            # 过滤出目标股票
-            stock_row = df[df['代码'] == stock_code]
-            if stock_row.empty:
-                return None
-            return stock_row.iloc[0].to_dict()
-            
-        realtime_data = fetch_data_with_retry(get_realtime_and_info)
-        
-        if not realtime_data:
-            raise HTTPException(status_code=404, detail=f"未找到代码为 {stock_code} 的股票数据")
-
-        # 行业字段兼容处理：优先使用板块名称，其次尝试行业/所属行业，空值统一回退为“暂无”
-        industry_value = "暂无"
-        for key in ["板块名称", "行业", "所属行业"]:
-            value = realtime_data.get(key)
-            if pd.notna(value) and str(value).strip():
-                industry_value = str(value).strip()
-                break
-
-        def get_latest_roe_value() -> tuple[float, str]:
-            try:
-                indicator_df = fetch_data_with_retry(
-                    ak.stock_financial_analysis_indicator,
-                    symbol=stock_code,
-                )
-            except Exception:
-                indicator_df = None
-
-            if isinstance(indicator_df, pd.DataFrame) and not indicator_df.empty:
-                candidate_cols = ["净资产收益率(%)", "净资产收益率", "ROE", "ROE(%)"]
-                for col in candidate_cols:
-                    if col in indicator_df.columns:
-                        series = pd.to_numeric(indicator_df[col], errors="coerce").dropna()
-                        if not series.empty:
-                            return round(float(series.iloc[-1]), 4), "financial_indicator"
-
-            realtime_roe_raw = realtime_data.get("净资产收益率")
-            if realtime_roe_raw is not None:
-                try:
-                    return round(float(realtime_roe_raw), 4), "realtime_fallback"
-                except (TypeError, ValueError):
-                    pass
-            return 0.0, "default_zero"
-
-        roe_value, roe_source = get_latest_roe_value()
-
-        # 组装 info 静态字段 (市值转换为亿元)
-        info_dict = {
-            "code": stock_code,
-            "name": realtime_data.get("名称", "未知"),
-            "industry": industry_value,
-            "total_mv": round(realtime_data.get("总市值", 0) / 100000000, 2), 
-            "pe_ttm": realtime_data.get("市盈率-动态", 0.0),
-            "roe": roe_value,
-            "roe_source": roe_source
-        }
-        
-        # 组装 realtime 实时盘口与资金快照
-        realtime_dict = {
-            "current_price": realtime_data.get("最新价", 0.0),
-            "volume_ratio": realtime_data.get("量比", 0.0),
-            "turnover_rate": realtime_data.get("换手率", 0.0),
-            "pct_change": realtime_data.get("涨跌幅", 0.0)
-        }
-
-        # ---------------------------------------------------------
-        # Step 2: 拉取 (获取历史序列，前复权，最近 250 天)
-        # ---------------------------------------------------------
-        def get_history_k_data():
-            # 强制 adjust="qfq" 获取前复权数据
-            hist_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", adjust="qfq")
-            # 完整抓取最近 250 个交易日，如果上市不足 250 天则按实际最大天数输出
-            return hist_df.tail(250)
-            
-        history_df = fetch_data_with_retry(get_history_k_data)
-        
-        history_list = []
-        if isinstance(history_df, pd.DataFrame) and not history_df.empty:
-            for _, row in history_df.iterrows():
-                history_list.append({
-                    "date": str(row["日期"]),
-                    "open": round(float(row["开盘"]), 3),
-                    "high": round(float(row["最高"]), 3),
-                    "low": round(float(row["最低"]), 3),
-                    "close": round(float(row["收盘"]), 3),
-                    "volume": int(row["成交量"]), 
-                    "turnover": round(float(row["换手率"]), 4) # 筹码分布的关键线索
-                })
-
-        # ---------------------------------------------------------
-        # Step 4: 组装输出
-        # ---------------------------------------------------------
-        result = {
-            "info": info_dict,
-            "history": history_list,
-            "realtime": realtime_dict
-        }
-
-        # Step 5: FastAPI 会自动将 result 字典序列化为标准的 JSON 格式输出
-        return result
+        cache_key = f"stock:{stock_code}:data"
+        result = await get_cached_response(cache_key)
+        if result is not None:
+            return result
+
+        async def build_and_store():
+            result = RESPONSE_CACHE.get(cache_key)
+            if result is None:
+                result = await build_stock_data(stock_code)
+                await set_cached_response(cache_key, result)
+            return result
 
+        return await single_flight(cache_key, build_and_store)
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# ---------------------------------------------------------
+# 日线磁盘缓存：每只股票一个 parquet 文件，收盘后只增量拉取新增的交易日
+# ---------------------------------------------------------
+HISTORY_CACHE_DIR = Path(".cache/hist")
+CN_TZ = timezone(timedelta(hours=8))
+
+def _last_market_close(now: datetime | None = None) -> datetime:
+    """
+    最近一次收盘数据落定的时刻（北京时间 15:30），早于该时刻写入的缓存视为过期。
+    """
+    now = now or datetime.now(CN_TZ)
+    close = now.replace(hour=15, minute=30, second=0, microsecond=0)
+    if now < close:
+        close -= timedelta(days=1)
+    return close
+
+def _compact_history(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    日线数值列降为 float32 / int32：内存与 parquet 体积减半。float32 约 7 位有效数字，
+    输出前再按 3~4 位小数取整，展示精度不受影响。
+    """
+    df = df.copy()
+    float_cols = df.select_dtypes("float64").columns
+    df[float_cols] = df[float_cols].astype(np.float32)
+    int_cols = df.select_dtypes("int64").columns
+    df[int_cols] = df[int_cols].astype(np.int32)
+    return df
+
+def load_history(stock_code: str, now: datetime | None = None) -> pd.DataFrame:
+    """
+    读取前复权日线：当天收盘后写入的缓存视为完整，直接读盘；否则从缓存最后一天起增量拉取。
+    收盘前当天那根日线仍在变动，只返回给调用方、不写入缓存，盘中每次都能拿到最新的当日 K 线。
+    """
+    now = now or datetime.now(CN_TZ)
+    today_settled = now >= now.replace(hour=15, minute=30, second=0, microsecond=0)
+    path = HISTORY_CACHE_DIR / f"{stock_code}.parquet"
+    cached = None
+    if path.exists():
+        try:
+            cached = pd.read_parquet(path)
+        except Exception as e:
+            print(f"读取日线缓存失败，改为全量拉取 (错误信息: {e})")
+        if (
+            cached is not None
+            and today_settled
+            and path.stat().st_mtime >= _last_market_close(now).timestamp()
+        ):
+            return cached
+
+    full = None
+    if cached is not None and not cached.empty:
+        last_date = pd.Timestamp(cached["日期"].iloc[-1])
+        delta = ak.stock_zh_a_hist(
+            symbol=stock_code, period="daily", adjust="qfq", start_date=last_date.strftime("%Y%m%d")
+        )
+        # 前复权价格在除权除息后会整体重算：重叠的那一天收盘价对不上时说明历史已变，必须全量重拉
+        if (
+            not delta.empty
+            and pd.Timestamp(delta["日期"].iloc[0]) == last_date
+            and np.isclose(float(delta["收盘"].iloc[0]), float(cached["收盘"].iloc[-1]))
+        ):
+            full = pd.concat([cached.iloc[:-1], delta], ignore_index=True)
+    refetched = full is None
+    if refetched:
+        full = ak.stock_zh_a_hist(symbol=stock_code, period="daily", adjust="qfq")
+    if full.empty:
+        return full
+    full = _compact_history(full)
+
+    settled = full
+    if not today_settled:
+        settled = full[pd.to_datetime(full["日期"]).dt.date < now.date()]
+    # 空结果（如停牌新股、上游异常返回）不落盘；盘中增量只带来当天未定型的 K 线时，磁盘上的内容无需改动
+    if settled.empty:
+        return full
+    if not today_settled and not refetched and cached is not None and len(settled) == len(cached):
+        return full
+
+    # 多个 worker 可能同时写同一代码：每次写入使用唯一的临时文件，写完后原子替换
+    tmp_path = None
+    try:
+        HISTORY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=HISTORY_CACHE_DIR, prefix=f"{stock_code}.", suffix=".tmp", delete=False
+        ) as tmp:
+            tmp_path = Path(tmp.name)
+            settled.to_parquet(tmp, compression="zstd", index=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"写入日线缓存失败，本次结果不落盘 (错误信息: {e})")
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+    return full
+
+# 日线字段 -> 输出字段
+HISTORY_COLUMNS = {
+    "日期": "date",
+    "开盘": "open",
+    "最高": "high",
+    "最低": "low",
+    "收盘": "close",
+    "成交量": "volume",
+    "换手率": "turnover",
+}
+
+async def build_stock_data(stock_code: str) -> dict:
+    """
+    实际的数据拉取与组装流程，结果由 get_stock_data 负责缓存
+    """
+    # ---------------------------------------------------------
+    # Step 1 & 3: 定位与捕获 (静态基础信息 + 当日实时盘口)
+    # ---------------------------------------------------------
+    async def get_realtime_and_info():
+        # 获取 A 股实时行情数据（包含基础信息），由后台任务定期刷新
+        df = await get_cached_market_data()
+        # 按代码索引定位目标股票
+        try:
+            return df.loc[stock_code].to_dict()
+        except KeyError:
+            return None
+
+    # ---------------------------------------------------------
+    # Step 2: 拉取 (获取历史序列，前复权，最近 250 天)
+    # ---------------------------------------------------------
+    def get_history_k_data():
+        # 强制 adjust="qfq" 获取前复权数据（优先读取磁盘缓存，仅增量拉取新交易日）
+        hist_df = load_history(stock_code)
+        # 完整抓取最近 250 个交易日，如果上市不足 250 天则按实际最大天数输出
+        return hist_df.tail(250)
+
+    async def get_financial_indicator():
+        try:
+            return await fetch_data_with_retry(
+                ak.stock_financial_analysis_indicator,
+                symbol=stock_code,
+            )
+        except Exception:
+            return None
+
+    # 实时行情来自已缓存的全市场行情表，按代码索引查找几乎无开销；先确认股票存在，未知代码立即返回 404，
+    # 不会为其发起日线与财务指标的网络请求
+    realtime_data = await get_realtime_and_info()
+    if not realtime_data:
+        raise HTTPException(status_code=404, detail=f"未找到代码为 {stock_code} 的股票数据")
+
+    # 日线与财务指标互不依赖，并发拉取，总耗时取决于较慢的一路；
+    # 日线走磁盘缓存（同一代码的并发读取经单飞合并），财务指标按股票代码缓存
+    history_df, indicator_df = await asyncio.gather(
+        single_flight(f"hist:{stock_code}", lambda: fetch_data_with_retry(get_history_k_data)),
+        cached_fetch(INDICATOR_CACHE, f"indicator:{stock_code}", get_financial_indicator),
+    )
+
+    # 行业字段兼容处理：优先使用板块名称，其次尝试行业/所属行业，空值统一回退为“暂无”
+    industry_value = "暂无"
+    for key in ["板块名称", "行业", "所属行业"]:
+        value = realtime_data.get(key)
+        if pd.notna(value) and str(value).strip():
+            industry_value = str(value).strip()
+            break
+
+    def get_latest_roe_value() -> tuple[float, str]:
+        if isinstance(indicator_df, pd.DataFrame) and not indicator_df.empty:
+            candidate_cols = ["净资产收益率(%)", "净资产收益率", "ROE", "ROE(%)"]
+            for col in candidate_cols:
+                if col in indicator_df.columns:
+                    series = pd.to_numeric(indicator_df[col], errors="coerce").dropna()
+                    if not series.empty:
+                        return round(float(series.iloc[-1]), 4), "financial_indicator"
+
+        realtime_roe_raw = realtime_data.get("净资产收益率")
+        if realtime_roe_raw is not None:
+            try:
+                return round(float(realtime_roe_raw), 4), "realtime_fallback"
+            except (TypeError, ValueError):
+                pass
+        return 0.0, "default_zero"
+
+    roe_value, roe_source = get_latest_roe_value()
+
+    # 组装 info 静态字段 (市值转换为亿元)
+    info_dict = {
+        "code": stock_code,
+        "name": realtime_data.get("名称", "未知"),
+        "industry": industry_value,
+        "total_mv": round(realtime_data.get("总市值", 0) / 100000000, 2), 
+        "pe_ttm": realtime_data.get("市盈率-动态", 0.0),
+        "roe": roe_value,
+        "roe_source": roe_source
+    }
+    
+    # 组装 realtime 实时盘口与资金快照
+    realtime_dict = {
+        "current_price": realtime_data.get("最新价", 0.0),
+        "volume_ratio": realtime_data.get("量比", 0.0),
+        "turnover_rate": realtime_data.get("换手率", 0.0),
+        "pct_change": realtime_data.get("涨跌幅", 0.0)
+    }
+
+    history_list = []
+    if isinstance(history_df, pd.DataFrame) and not history_df.empty:
+        # 先按列整体完成类型转换与取整（NumPy 向量化），再一次性转换为记录列表，避免逐行处理
+        h = history_df[list(HISTORY_COLUMNS)].copy()
+        price_cols = ["开盘", "最高", "最低", "收盘"]
+        h[price_cols] = h[price_cols].astype(np.float64).round(3)
+        h["换手率"] = h["换手率"].astype(np.float64).round(4) # 筹码分布的关键线索
+        h["成交量"] = h["成交量"].astype(np.int64)
+        h["日期"] = h["日期"].astype(str)
+        history_list = h.rename(columns=HISTORY_COLUMNS).to_dict("records")
+
+    # ---------------------------------------------------------
+    # Step 4: 组装输出
+    # ---------------------------------------------------------
+    result = {
+        "info": info_dict,
+        "history": history_list,
+        "realtime": realtime_dict
+    }
+
+    # Step 5: FastAPI 会按 StockDataResponse 校验 result 字典并序列化为标准的 JSON 格式输出
+    return result
+
 if __name__ == "__main__":
-    # 运行服务器，默认绑定 8000 端口
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # 运行服务器，默认绑定 8000 端口；worker 数量由 WEB_CONCURRENCY 控制（多进程需以导入字符串传入 app）。
+    # 每个 worker 各自持有一份全市场行情表并各自运行后台刷新任务，内存与上游请求量随 worker 数线性增长，
+    # 默认单 worker 以适配 Render 512MB 实例，内存充裕时再调大。
+    # loop/http 取 auto：安装 uvicorn[standard] 后自动使用 uvloop + httptools，Windows 等不支持的平台自动回退
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        loop="auto",
+        http="auto",
+        access_log=False,
+    )
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# main.py 位于仓库根目录，测试直接以模块方式导入
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,119 @@
+import os
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+import main
+
+
+def make_bars(days: list[int], closes: list[float]) -> pd.DataFrame:
+    """构造 akshare stock_zh_a_hist 形状的日线（2025 年 3 月的若干天）"""
+    return pd.DataFrame({
+        "日期": [date(2025, 3, d) for d in days],
+        "开盘": closes,
+        "收盘": closes,
+        "最高": closes,
+        "最低": closes,
+        "成交量": [1000] * len(days),
+        "换手率": [0.5] * len(days),
+    })
+
+
+def closes(df: pd.DataFrame) -> list[float]:
+    # 缓存中的价格为 float32，与接口输出一致先还原为 float64 再取整
+    return df["收盘"].astype(float).round(3).tolist()
+
+
+def at(day: int, hour: int, minute: int = 0) -> datetime:
+    return datetime(2025, 3, day, hour, minute, tzinfo=main.CN_TZ)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "HISTORY_CACHE_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def fake_hist(monkeypatch):
+    """按调用顺序依次返回预设结果，并记录每次请求的 start_date（全量拉取记为 None）"""
+    responses: list[pd.DataFrame] = []
+    calls: list[str | None] = []
+
+    def stock_zh_a_hist(symbol, period, adjust, start_date=None):
+        calls.append(start_date)
+        return responses.pop(0)
+
+    monkeypatch.setattr(main.ak, "stock_zh_a_hist", stock_zh_a_hist)
+    return responses, calls
+
+
+def write_cache(cache_dir, df: pd.DataFrame, written_at: datetime):
+    path = cache_dir / "600000.parquet"
+    df.to_parquet(path, index=False)
+    os.utime(path, (written_at.timestamp(), written_at.timestamp()))
+    return path
+
+
+def test_fresh_file_needs_no_network(cache_dir, fake_hist):
+    _, calls = fake_hist
+    write_cache(cache_dir, make_bars([3, 4, 5], [10.0, 10.1, 10.2]), written_at=at(5, 15, 45))
+
+    df = main.load_history("600000", now=at(5, 20))
+
+    assert calls == []
+    assert closes(df) == [10.0, 10.1, 10.2]
+
+
+def test_matching_overlap_appends_delta(cache_dir, fake_hist):
+    responses, calls = fake_hist
+    path = write_cache(cache_dir, make_bars([3, 4, 5], [10.0, 10.1, 10.2]), written_at=at(5, 15, 45))
+    responses.append(make_bars([5, 6], [10.2, 10.3]))
+
+    df = main.load_history("600000", now=at(6, 16))
+
+    assert calls == ["20250305"]
+    assert [d.day for d in pd.to_datetime(df["日期"])] == [3, 4, 5, 6]
+    assert closes(df) == [10.0, 10.1, 10.2, 10.3]
+    assert len(pd.read_parquet(path)) == 4
+
+
+def test_mismatched_overlap_refetches_everything(cache_dir, fake_hist):
+    responses, calls = fake_hist
+    path = write_cache(cache_dir, make_bars([3, 4, 5], [10.0, 10.1, 10.2]), written_at=at(5, 15, 45))
+    # 除权除息后前复权价格整体下调，重叠那天的收盘价与缓存不一致
+    responses.append(make_bars([5, 6], [9.2, 9.3]))
+    responses.append(make_bars([3, 4, 5, 6], [9.0, 9.1, 9.2, 9.3]))
+
+    df = main.load_history("600000", now=at(6, 16))
+
+    assert calls == ["20250305", None]
+    assert closes(df) == [9.0, 9.1, 9.2, 9.3]
+    assert closes(pd.read_parquet(path)) == [9.0, 9.1, 9.2, 9.3]
+
+
+def test_intraday_bar_is_returned_but_not_persisted(cache_dir, fake_hist):
+    responses, calls = fake_hist
+    path = write_cache(cache_dir, make_bars([3, 4, 5], [10.0, 10.1, 10.2]), written_at=at(5, 15, 45))
+    responses.append(make_bars([5, 6], [10.2, 10.25]))
+    responses.append(make_bars([5, 6], [10.2, 10.4]))
+
+    first = main.load_history("600000", now=at(6, 10))
+    second = main.load_history("600000", now=at(6, 11))
+
+    # 盘中每次都增量拉取，返回最新的当日 K 线；磁盘上只保留已收盘的交易日
+    assert calls == ["20250305", "20250305"]
+    assert closes(first)[-1] == 10.25
+    assert closes(second)[-1] == 10.4
+    assert [d.day for d in pd.to_datetime(pd.read_parquet(path)["日期"])] == [3, 4, 5]
+
+
+def test_empty_result_is_not_written(cache_dir, fake_hist):
+    responses, _ = fake_hist
+    responses.append(pd.DataFrame())
+
+    df = main.load_history("999999", now=at(6, 16))
+
+    assert df.empty
+    assert list(cache_dir.iterdir()) == []
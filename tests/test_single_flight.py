@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from cachetools import TTLCache
+
+import main
+
+
+def test_duplicate_callers_share_one_fetch():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": 42}
+
+    async def run():
+        cache = TTLCache(maxsize=8, ttl=60)
+        results = await asyncio.gather(*[main.cached_fetch(cache, "k", fetch) for _ in range(10)])
+        # 结果写回缓存后，再次读取不会触发拉取
+        again = await main.cached_fetch(cache, "k", fetch)
+        return results, again
+
+    results, again = asyncio.run(run())
+    assert calls == 1
+    assert all(r is results[0] for r in results)
+    assert again is results[0]
+    assert main._inflight == {}
+
+
+def test_exception_reaches_every_waiter():
+    calls = 0
+    error = RuntimeError("upstream down")
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise error
+
+    async def run():
+        return await asyncio.gather(
+            *[main.single_flight("boom", fetch) for _ in range(5)], return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(r is error for r in results)
+    assert main._inflight == {}
+
+
+def test_cancelled_waiter_does_not_cancel_others():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def run():
+        first = asyncio.ensure_future(main.single_flight("slow", fetch))
+        second = asyncio.ensure_future(main.single_flight("slow", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "ok"
+    assert main._inflight == {}
+
+
+def test_none_result_is_not_cached():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return None
+
+    async def run():
+        cache = TTLCache(maxsize=8, ttl=60)
+        await main.cached_fetch(cache, "k", fetch)
+        await main.cached_fetch(cache, "k", fetch)
+        return cache
+
+    cache = asyncio.run(run())
+    assert calls == 2
+    assert "k" not in cache